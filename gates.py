@@ -1,18 +1,54 @@
 # gates.py
 from __future__ import annotations
 
+import heapq
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import chain
+from operator import itemgetter
 from collections import defaultdict
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 
 # IMPORTANT:
 # Do NOT import run_ec_gates from gates (self-import). That causes circular import.
 # main.py imports run_ec_gates from here.
 
+ORG_FIELDS = ("company", "businessUnit", "division", "department", "location")
+# One C-level call for all five org values (every EmpJob select candidate projects them).
+_org_values = itemgetter(*ORG_FIELDS)
+# Bit i set = ORG_FIELDS[i] blank; precomputed field tuples and labels for all 32 masks.
+_ORG_FIELDS_BY_MASK = tuple(
+    tuple(k for i, k in enumerate(ORG_FIELDS) if m >> i & 1) for m in range(1 << len(ORG_FIELDS))
+)
+_ORG_LABEL_BY_MASK = tuple(", ".join(fields) for fields in _ORG_FIELDS_BY_MASK)
+
+# Normalized (stripped + lowercased) tokens, as frozensets for O(1) membership.
+_TRUE_TOKENS = frozenset({"true", "t", "1", "yes", "y"})
+_FALSE_TOKENS = frozenset({"false", "f", "0", "no", "n"})
+_ACTIVE_USER_STATUS = _TRUE_TOKENS | {"active", "a"}
+_INACTIVE_USER_STATUS = _FALSE_TOKENS | {"inactive", "i"}
+_ACTIVE_EMPLSTATUS = frozenset({"a", "active"})
+_MISSING_EMAIL_TOKENS = frozenset({"", "none", "no_email", "no email", "null", "n/a", "na", "-", "undefined"})
+
 
 def is_blank(v) -> bool:
-    return v is None or str(v).strip() == ""
+    if v is None:
+        return True
+    if type(v) is str:  # the usual case: no str() copy needed
+        return not v.strip()
+    return not str(v).strip()
+
+
+def canonical_user_id(v) -> str:
+    """
+    userId is the join key across User/EmpJob/EmpEmployment.
+    Canonicalize it once at ingestion so every later lookup can use it as-is.
+    """
+    if v is None:
+        return ""
+    return v.strip() if type(v) is str else str(v).strip()
 
 
 def extract_scalar(v):
@@ -36,8 +72,7 @@ def norm(v) -> str:
 def is_missing_email_value(v) -> bool:
     if v is None:
         return True
-    s = str(v).strip().lower()
-    return s in ("", "none", "no_email", "no email", "null", "n/a", "na", "-", "undefined")
+    return str(v).strip().lower() in _MISSING_EMAIL_TOKENS
 
 
 def safe_get_all(sf, path: str, params: dict) -> List[dict]:
@@ -50,15 +85,84 @@ def safe_get_all(sf, path: str, params: dict) -> List[dict]:
         raise RuntimeError(f"SF API error calling {path} with params={params}: {e}")
 
 
+def _clean_errors(rows, path: str, params: dict):
+    try:
+        yield from rows
+    except Exception as e:
+        raise RuntimeError(f"SF API error calling {path} with params={params}: {e}")
+
+
+def safe_iter_all(sf, path: str, params: dict):
+    """
+    Streaming twin of safe_get_all (rows are yielded as pages arrive).
+    """
+    return _clean_errors(sf.iter_all(path, params), path, params)
+
+
+def first_row(sf, path: str, params: dict) -> Optional[dict]:
+    """
+    Cheap existence/validity probe: reads only the first page (pass a small $top).
+    """
+    return next(safe_iter_all(sf, path, params), None)
+
+
+def _started(rows) -> Iterator[dict]:
+    """
+    Pull the first row now, so a rejected request raises here, and return an iterator
+    over all rows (the rest still stream page by page).
+    """
+    it = iter(rows)
+    first = next(it, None)
+    return it if first is None else chain((first,), it)
+
+
+def _future_rows(f):
+    yield from f.result()
+
+
+def fetch_many(sf, reads: List[tuple]) -> Tuple[list, Optional[str]]:
+    """
+    Start several independent (path, params) reads together.
+    Uses one OData $batch round trip when the client supports it; otherwise concurrent paged reads.
+    Returns (one row iterator per read, $batch error or None); read errors surface (cleanly worded)
+    when an iterator is consumed.
+    """
+    batch_err = None
+    batch = getattr(sf, "batch_iter_all", None)
+    if batch is not None:
+        try:
+            return [_clean_errors(rows, path, params) for rows, (path, params) in zip(batch(reads), reads)], None
+        except Exception as e:
+            # $batch not available on this tenant/proxy; keep the reason and fall back to individual reads
+            batch_err = str(e)
+
+    # Network-bound and independent: overlap them on threads (requests releases the GIL on I/O).
+    with ThreadPoolExecutor(max_workers=len(reads)) as ex:
+        futures = [ex.submit(safe_get_all, sf, path, params) for path, params in reads]
+    return [_future_rows(f) for f in futures], batch_err
+
+
 def is_active_from_user_status(v) -> Optional[bool]:
     """
     User.status is NOT consistent across tenants (sometimes always 'active' for visible users).
     We use it only as a fallback.
     """
+    if v is None:
+        return None
+    if isinstance(v, bool):
+        return v
+    if type(v) is str:
+        return _user_status_active(v)
+    return _user_status_active(norm(v))
+
+
+@lru_cache(maxsize=256)
+def _user_status_active(v: str) -> Optional[bool]:
+    # Only a handful of distinct status strings exist per tenant.
     s = norm(v)
-    if s in ("active", "a", "true", "t", "1", "yes", "y"):
+    if s in _ACTIVE_USER_STATUS:
         return True
-    if s in ("inactive", "i", "false", "f", "0", "no", "n"):
+    if s in _INACTIVE_USER_STATUS:
         return False
     return None  # unknown
 
@@ -68,12 +172,16 @@ def is_active_from_emplstatus(v) -> Optional[bool]:
     EmpJob.emplStatus is usually a code like 'A' for Active.
     Treat anything non-empty and not 'A' as inactive (terminated/retired/etc).
     """
-    s = norm(v)
+    return emplstatus_token_active(norm(v))
+
+
+def emplstatus_token_active(s: str) -> Optional[bool]:
+    """
+    Same as is_active_from_emplstatus, for a value the caller already ran through norm().
+    """
     if not s:
         return None
-    if s in ("a", "active"):
-        return True
-    return False
+    return s in _ACTIVE_EMPLSTATUS
 
 
 def truthy_sf_bool(v) -> Optional[bool]:
@@ -84,14 +192,35 @@ def truthy_sf_bool(v) -> Optional[bool]:
         return None
     if isinstance(v, bool):
         return v
+    if type(v) is str:
+        return _sf_bool_token(v)
+    return _sf_bool_token(norm(v))
+
+
+@lru_cache(maxsize=256)
+def _sf_bool_token(v: str) -> Optional[bool]:
+    # Flag strings repeat on every row ("true"/"false", "Y"/"N"...): normalize each once.
     s = norm(v)
-    if s in ("true", "t", "1", "yes", "y"):
+    if s in _TRUE_TOKENS:
         return True
-    if s in ("false", "f", "0", "no", "n"):
+    if s in _FALSE_TOKENS:
         return False
     return None
 
 
+@lru_cache(maxsize=256)
+def _contingent_class_token(v: str) -> bool:
+    # employeeClass/employmentType/employeeType come from short picklists: classify each spelling once.
+    s = norm(v)
+    if not s:
+        return False
+    return (
+        s in ("c", "contingent", "contingent worker", "contractor")
+        or ("conting" in s)
+        or ("contract" in s)
+    )
+
+
 def run_ec_gates(
     sf,
     *,
@@ -104,15 +233,6 @@ def run_ec_gates(
     MAX_SAMPLE = 200
     MAX_USERS_PER_DUP_EMAIL = 10
 
-    # ---------------------------
-    # USERS (Email hygiene base list)
-    # ---------------------------
-    users = safe_get_all(
-        sf,
-        "/odata/v2/User",
-        {"$select": "userId,status,email,username"},
-    )
-
     # ---------------------------
     # EMPJOB (Latest records) with safe fallback
     # ---------------------------
@@ -131,20 +251,58 @@ def run_ec_gates(
         "userId,managerId,company,businessUnit,division,department,location,effectiveLatestChange",
     ]
 
-    jobs: List[dict] = []
+    empjob_filter = "effectiveLatestChange eq true"
+    if company_id:
+        # OData string literals escape single quotes by doubling them
+        empjob_filter += " and company eq '" + company_id.replace("'", "''") + "'"
+
+    user_params = {"$select": "userId,status,email,username"}
+    empemployment_params = {"$select": "userId,isContingentWorker"}
+
+    # EmpJob (richest select), User and EmpEmployment are independent: start them together.
+    (job_rows, user_rows, empemployment_rows), batch_err = fetch_many(
+        sf,
+        [
+            ("/odata/v2/EmpJob", {"$select": empjob_select_candidates[0], "$filter": empjob_filter}),
+            ("/odata/v2/User", user_params),
+            ("/odata/v2/EmpEmployment", empemployment_params),
+        ],
+    )
+
+    jobs: Iterator[dict] = iter(())
     used_select = None
     last_err = None
-    for sel in empjob_select_candidates:
-        try:
-            jobs = safe_get_all(
-                sf,
-                "/odata/v2/EmpJob",
-                {"$select": sel, "$filter": "effectiveLatestChange eq true"},
-            )
-            used_select = sel
-            break
-        except Exception as e:
-            last_err = e
+    try:
+        jobs = _started(job_rows)
+        used_select = empjob_select_candidates[0]
+    except Exception as e:
+        last_err = e
+
+    if used_select is None:
+        # Richest select was rejected: probe the narrower ones concurrently with a 1-row read,
+        # then fetch in full with the richest one the tenant accepts.
+        fallbacks = empjob_select_candidates[1:]
+        with ThreadPoolExecutor(max_workers=len(fallbacks)) as ex:
+            probes = [
+                ex.submit(first_row, sf, "/odata/v2/EmpJob", {"$select": sel, "$filter": empjob_filter, "$top": 1})
+                for sel in fallbacks
+            ]
+        for sel, probe in zip(fallbacks, probes):
+            if probe.exception() is not None:
+                last_err = probe.exception()
+                continue
+            try:
+                jobs = _started(
+                    safe_iter_all(
+                        sf,
+                        "/odata/v2/EmpJob",
+                        {"$select": sel, "$filter": empjob_filter},
+                    )
+                )
+                used_select = sel
+                break
+            except Exception as e:
+                last_err = e
 
     if used_select is None:
         raise RuntimeError(f"Unable to fetch EmpJob with any select candidate. Last error: {last_err}")
@@ -161,133 +319,49 @@ def run_ec_gates(
     empemployment_err = None
 
     try:
-        empemployment = safe_get_all(
-            sf,
-            "/odata/v2/EmpEmployment",
-            {"$select": "userId,isContingentWorker"},
-        )
-        empemployment_available = True
-        for r in empemployment:
-            uid = r.get("userId")
+        # Consumed as pages arrive; published only once the whole read succeeded.
+        flags: dict[str, bool] = {}
+        for r in empemployment_rows:
+            uid = canonical_user_id(r.get("userId"))
             if not uid:
                 continue
             b = truthy_sf_bool(r.get("isContingentWorker"))
             if b is not None:
-                contingent_by_empemployment[uid] = b
-        if empemployment_available:
-            contingent_source = "EmpEmployment.isContingentWorker -> fallback(EmpJob fields)"
+                flags[uid] = b
+        contingent_by_empemployment = flags
+        empemployment_available = True
+        contingent_source = "EmpEmployment.isContingentWorker -> fallback(EmpJob fields)"
     except Exception as e:
         empemployment_err = str(e)
 
     # ---------------------------
-    # STATUS: ACTIVE vs INACTIVE (prefer EmpJob.emplStatus)
+    # JOBS: status + ORG + MANAGER checks + CONTINGENT (one pass over EmpJob)
     # ---------------------------
-    job_status_by_user: dict[str, Any] = {}
+    # userId -> (raw emplStatus, active?) from the latest job
+    job_status_by_user: dict[str, tuple] = {}
     emplstatus_value_counts = defaultdict(int)
 
-    for j in jobs:
-        uid = j.get("userId")
-        es = j.get("emplStatus")
-        if uid:
-            job_status_by_user[uid] = es
-        s = norm(es)
-        if s:
-            emplstatus_value_counts[s] += 1
-
-    active_users: List[dict] = []
-    inactive_users: List[dict] = []
-    inactive_users_sample: List[dict] = []
-    unknown_status_user_count = 0
-
-    for u in users:
-        uid = u.get("userId")
-
-        # 1) Prefer EmpJob.emplStatus
-        job_es = job_status_by_user.get(uid)
-        a = is_active_from_emplstatus(job_es)
-
-        # 2) Fallback to User.status
-        if a is None:
-            a = is_active_from_user_status(u.get("status"))
-
-        # 3) If still unknown, track it (don’t silently inflate inactive)
-        if a is None:
-            unknown_status_user_count += 1
-            a = True  # safest default
-
-        if a:
-            active_users.append(u)
-        else:
-            inactive_users.append(u)
-            if len(inactive_users_sample) < MAX_SAMPLE:
-                inactive_users_sample.append(
-                    {
-                        "userId": uid,
-                        "emplStatus": job_es,
-                        "status": u.get("status"),
-                        "email": u.get("email"),
-                        "username": u.get("username"),
-                    }
-                )
-
-    total_active = len(active_users)
-    inactive_user_count = len(inactive_users)
-
-    # ---------------------------
-    # Email hygiene (among ACTIVE users)
-    # ---------------------------
-    missing_email_sample: List[dict] = []
-    email_to_users = defaultdict(list)
-
-    for u in active_users:
-        uid = u.get("userId")
-        raw_email = u.get("email")
-        email = "" if raw_email is None else str(raw_email).strip()
-        email_norm = email.lower()
-
-        if is_missing_email_value(email):
-            if len(missing_email_sample) < MAX_SAMPLE:
-                missing_email_sample.append(
-                    {"userId": uid, "email": email, "username": u.get("username")}
-                )
-            continue
-
-        email_to_users[email_norm].append(uid)
-
-    missing_email_count = sum(1 for u in active_users if is_missing_email_value(u.get("email")))
-
-    duplicate_email_count = sum((len(uids) - 1) for _, uids in email_to_users.items() if len(uids) > 1)
-
-    dup_rows = []
-    for email, uids in email_to_users.items():
-        if len(uids) > 1:
-            dup_rows.append(
-                {"email": email, "count": len(uids), "sampleUserIds": uids[:MAX_USERS_PER_DUP_EMAIL]}
-            )
-    dup_rows.sort(key=lambda x: x["count"], reverse=True)
-    duplicate_email_sample = dup_rows[:MAX_SAMPLE]
-
-    # ---------------------------
-    # ORG + MANAGER checks + CONTINGENT (from EmpJob/EmpEmployment)
-    # ---------------------------
-    ORG_FIELDS = ["company", "businessUnit", "division", "department", "location"]
+    # emplStatus draws from a handful of codes, so resolve each distinct string once
+    # instead of re-normalizing it for every job and again for every user.
+    resolved_emplstatus: dict[Optional[str], tuple] = {}
 
     missing_manager_count = 0
     invalid_org_count = 0
     missing_manager_sample: List[dict] = []
     invalid_org_sample: List[dict] = []
+    # Samples stop growing at MAX_SAMPLE; once full, rows only feed the counts.
+    missing_manager_sample_full = False
+    invalid_org_sample_full = False
     org_missing_field_counts = {k: 0 for k in ORG_FIELDS}
 
+    omfc = org_missing_field_counts
+
     contingent_worker_count = 0
     contingent_workers_sample: List[dict] = []
+    contingent_sample_full = False
 
     def is_contingent_job(j: dict) -> bool:
-        uid = j.get("userId")
-
-        # 1) Prefer EmpEmployment.isContingentWorker if we have it
-        if uid and uid in contingent_by_empemployment:
-            return bool(contingent_by_empemployment[uid])
-
+        # EmpJob-only signals; the jobs pass checks EmpEmployment.isContingentWorker first.
         # 2) Try EmpJob.isContingentWorker if exists
         b = truthy_sf_bool(j.get("isContingentWorker"))
         if b is not None:
@@ -295,46 +369,93 @@ def run_ec_gates(
 
         # 3) Fallback heuristics
         raw = j.get("employeeClass") or j.get("employmentType") or j.get("employeeType") or ""
-        s = norm(raw)
-        if not s:
-            return False
-        return (
-            s in ("c", "contingent", "contingent worker", "contractor")
-            or ("conting" in s)
-            or ("contract" in s)
-        )
+        if type(raw) is str:
+            return _contingent_class_token(raw)
+        return _contingent_class_token(norm(raw))
+
+    empjob_row_count = 0
+    # Hoisted: hit once per job in the loop below.
+    empemployment_contingent = contingent_by_empemployment.get
 
+    # EmpJob pages are consumed as they arrive; only per-user status and samples are kept.
     for j in jobs:
-        uid = j.get("userId")
+        empjob_row_count += 1
+        uid = j["userId"] = canonical_user_id(j.get("userId"))
+        es = j.get("emplStatus")
+        # Nav/code dicts are a fresh object per row; key them on the code they carry.
+        key = extract_scalar(es) if type(es) is dict else es
+        if key is None or type(key) is str:
+            r = resolved_emplstatus.get(key)
+            if r is None:
+                s = norm(key)
+                r = resolved_emplstatus[key] = (s, emplstatus_token_active(s))
+            s, job_active = r
+        else:
+            s = norm(es)
+            job_active = emplstatus_token_active(s)
+        if uid:
+            job_status_by_user[uid] = (es, job_active)
+        if s:
+            emplstatus_value_counts[s] += 1
+
         mgr = j.get("managerId")
 
-        if is_blank(mgr):
+        # is_blank inlined for the common None/str cases (a cache would cost more than strip()).
+        if mgr is None or (not mgr or mgr.isspace() if type(mgr) is str else is_blank(mgr)):
             missing_manager_count += 1
-            if len(missing_manager_sample) < MAX_SAMPLE:
+            if not missing_manager_sample_full:
                 missing_manager_sample.append({"userId": uid, "managerId": mgr})
+                missing_manager_sample_full = len(missing_manager_sample) >= MAX_SAMPLE
 
-        missing_fields = [k for k in ORG_FIELDS if is_blank(j.get(k))]
-        if missing_fields:
+        # Unrolled over the fixed ORG_FIELDS with is_blank inlined: this is the hottest loop.
+        # Fast path: all five truthy and none whitespace-only means nothing is blank (most rows).
+        # Anything else (incl. falsy non-blanks like 0) takes the exact per-field check.
+        try:
+            c, bu, dv, dp, lc = _org_values(j)
+        except KeyError:
+            c, bu, dv, dp, lc = map(j.get, ORG_FIELDS)
+        if not (
+            c and bu and dv and dp and lc
+            and (type(c) is not str or not c.isspace())
+            and (type(bu) is not str or not bu.isspace())
+            and (type(dv) is not str or not dv.isspace())
+            and (type(dp) is not str or not dp.isspace())
+            and (type(lc) is not str or not lc.isspace())
+        ):
+            c_b = c is None or (isinstance(c, str) and not c.strip())
+            bu_b = bu is None or (isinstance(bu, str) and not bu.strip())
+            dv_b = dv is None or (isinstance(dv, str) and not dv.strip())
+            dp_b = dp is None or (isinstance(dp, str) and not dp.strip())
+            lc_b = lc is None or (isinstance(lc, str) and not lc.strip())
+            missing = c_b | bu_b << 1 | dv_b << 2 | dp_b << 3 | lc_b << 4
+        else:
+            missing = 0
+        if missing:
             invalid_org_count += 1
-            for f in missing_fields:
-                org_missing_field_counts[f] += 1
-            if len(invalid_org_sample) < MAX_SAMPLE:
+            for f in _ORG_FIELDS_BY_MASK[missing]:
+                omfc[f] += 1
+            if not invalid_org_sample_full:
                 invalid_org_sample.append(
                     {
                         "userId": uid,
-                        "missingFields": ", ".join(missing_fields),
-                        "company": j.get("company"),
-                        "businessUnit": j.get("businessUnit"),
-                        "division": j.get("division"),
-                        "department": j.get("department"),
-                        "location": j.get("location"),
+                        "missingFields": _ORG_LABEL_BY_MASK[missing],
+                        "company": c,
+                        "businessUnit": bu,
+                        "division": dv,
+                        "department": dp,
+                        "location": lc,
                         "managerId": mgr,
                     }
                 )
+                invalid_org_sample_full = len(invalid_org_sample) >= MAX_SAMPLE
 
-        if is_contingent_job(j):
+        # 1) Prefer EmpEmployment.isContingentWorker if we have it (a plain dict hit for most rows)
+        contingent = empemployment_contingent(uid)
+        if contingent is None:
+            contingent = is_contingent_job(j)
+        if contingent:
             contingent_worker_count += 1
-            if len(contingent_workers_sample) < MAX_SAMPLE:
+            if not contingent_sample_full:
                 contingent_workers_sample.append(
                     {
                         "userId": uid,
@@ -344,10 +465,106 @@ def run_ec_gates(
                         "employmentType": j.get("employmentType"),
                     }
                 )
+                contingent_sample_full = len(contingent_workers_sample) >= MAX_SAMPLE
 
     # ---------------------------
-    # Percent helper
+    # USERS + email hygiene (classified as pages stream in, among ACTIVE users)
     # ---------------------------
+    # Company scope: only users holding a (latest) job in that company are in play.
+    scope_user_ids = job_status_by_user if company_id else None
+
+    total_active = 0
+    inactive_user_count = 0
+    inactive_users_sample: List[dict] = []
+    inactive_sample_full = False
+    unknown_status_user_count = 0
+
+    missing_email_count = 0
+    duplicate_email_count = 0
+    missing_email_sample: List[dict] = []
+    missing_email_sample_full = False
+    # Most emails are unique: remember just the first (first-seen position, userId), and only
+    # allocate a list once an email actually repeats.
+    first_uid_by_email: dict[str, tuple] = {}
+    dup_uids_by_email: dict[str, List[str]] = {}
+
+    for u in user_rows:
+        uid = u["userId"] = canonical_user_id(u.get("userId"))
+        if scope_user_ids is not None and uid not in scope_user_ids:
+            continue
+
+        # 1) Prefer EmpJob.emplStatus
+        job_es, a = job_status_by_user.get(uid) or (None, None)
+
+        # 2) Fallback to User.status
+        if a is None:
+            a = is_active_from_user_status(u.get("status"))
+
+        # 3) If still unknown, track it (don’t silently inflate inactive)
+        if a is None:
+            unknown_status_user_count += 1
+            a = True  # safest default
+
+        if not a:
+            inactive_user_count += 1
+            if not inactive_sample_full:
+                inactive_users_sample.append(
+                    {
+                        "userId": uid,
+                        "emplStatus": job_es,
+                        "status": u.get("status"),
+                        "email": u.get("email"),
+                        "username": u.get("username"),
+                    }
+                )
+                inactive_sample_full = len(inactive_users_sample) >= MAX_SAMPLE
+            continue
+
+        total_active += 1
+        raw_email = u.get("email")
+        email = "" if raw_email is None else str(raw_email).strip()
+        email_norm = email.lower()
+
+        # email is already stripped, so its lowered form is the missing-token key.
+        if email_norm in _MISSING_EMAIL_TOKENS:
+            missing_email_count += 1
+            if not missing_email_sample_full:
+                missing_email_sample.append(
+                    {"userId": uid, "email": email, "username": u.get("username")}
+                )
+                missing_email_sample_full = len(missing_email_sample) >= MAX_SAMPLE
+            continue
+
+        first = first_uid_by_email.get(email_norm)
+        if first is None:
+            first_uid_by_email[email_norm] = (len(first_uid_by_email), uid)
+            continue
+
+        duplicate_email_count += 1  # every user after the first sharing an email
+        uids = dup_uids_by_email.get(email_norm)
+        if uids is None:
+            dup_uids_by_email[email_norm] = [first[1], uid]
+        else:
+            uids.append(uid)
+
+    # Only the top MAX_SAMPLE are reported: partial sort the groups, then build rows for those alone.
+    # Equal counts keep first-seen email order (groups are created on the first repeat, not first sighting).
+    top_dups = heapq.nlargest(
+        MAX_SAMPLE,
+        dup_uids_by_email.items(),
+        key=lambda kv: (len(kv[1]), -first_uid_by_email[kv[0]][0]),
+    )
+    duplicate_email_sample = [
+        {"email": email, "count": len(uids), "sampleUserIds": uids[:MAX_USERS_PER_DUP_EMAIL]}
+        for email, uids in top_dups
+    ]
+
+    # ---------------------------
+    # Percent helpers (pct_bp: integer basis points, 1 bp = 0.01%, used for risk)
+    # ---------------------------
+    def pct_bp(x: int) -> int:
+        return 0 if total_active == 0 else (x * 10000) // total_active
+
     def pct(x: int) -> float:
         return 0.0 if total_active == 0 else round((x / total_active) * 100, 2)
 
@@ -358,11 +575,12 @@ def run_ec_gates(
     # ---------------------------
     # Risk score (simple)
     # ---------------------------
+    # Floors the exact ratios, so a tiny non-zero pct can't round up into a point.
     risk = 0
-    risk += min(40, int(missing_manager_pct * 2))
-    risk += min(40, int(invalid_org_pct * 2))
-    risk += min(10, int(missing_email_pct))
-    risk += min(10, int((duplicate_email_count / max(1, total_active)) * 100))
+    risk += min(40, pct_bp(missing_manager_count) // 50)
+    risk += min(40, pct_bp(invalid_org_count) // 50)
+    risk += min(10, pct_bp(missing_email_count) // 100)
+    risk += min(10, (duplicate_email_count * 100) // max(1, total_active))
     risk_score = min(100, risk)
 
     # ---------------------------
@@ -381,8 +599,8 @@ def run_ec_gates(
         "inactive_user_count": inactive_user_count,
 
         # EmpJob
-        "empjob_rows": len(jobs),
-        "current_empjob_rows": len(jobs),
+        "empjob_rows": empjob_row_count,
+        "current_empjob_rows": empjob_row_count,
 
         # checks
         "missing_manager_count": missing_manager_count,
@@ -418,6 +636,7 @@ def run_ec_gates(
         "empjob_select_used": used_select,
         "empemployment_available": empemployment_available,
         "empemployment_error": empemployment_err or "",
+        "batch_error": batch_err or "",
     }
 
     return metrics
@@ -2,10 +2,11 @@
 from __future__ import annotations
 
 import os
-import inspect
 from datetime import datetime
 
+import orjson
 from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 
 from sqlalchemy import create_engine, Column, Integer, DateTime, JSON
@@ -34,7 +35,13 @@ class Snapshot(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     metrics = Column(JSON, nullable=False)
 
-engine = create_engine(DB_URL, pool_pre_ping=True)
+engine = create_engine(
+    DB_URL,
+    pool_pre_ping=True,
+    # metrics payloads carry large sample lists; orjson encodes them much faster than stdlib json
+    json_serializer=lambda o: orjson.dumps(o, option=orjson.OPT_NON_STR_KEYS).decode(),
+    json_deserializer=orjson.loads,
+)
 Base.metadata.create_all(engine)
 SessionLocal = sessionmaker(bind=engine)
 
@@ -99,20 +106,6 @@ def probe(
         raise HTTPException(status_code=400, detail=f"Probe failed: {str(e)}")
 
 
-def _run_ec_gates_compat(sf: SFClient, *, instance_url: str, api_base_url: str, company_id: str | None):
-    """
-    Call run_ec_gates with company_id only if gates.py supports it.
-    This prevents: 'unexpected keyword argument company_id'
-    """
-    sig = inspect.signature(run_ec_gates)
-    kwargs = {"instance_url": instance_url, "api_base_url": api_base_url}
-
-    if "company_id" in sig.parameters:
-        kwargs["company_id"] = company_id
-
-    return run_ec_gates(sf, **kwargs)
-
-
 @app.post("/run")
 def run_now(req: RunRequest):
     instance_url = normalize_base_url(req.instance_url or "")
@@ -139,7 +132,7 @@ def run_now(req: RunRequest):
         raise HTTPException(status_code=400, detail=f"Invalid API base URL or credentials: {str(e)}")
 
     try:
-        metrics = _run_ec_gates_compat(
+        metrics = run_ec_gates(
             sf,
             instance_url=instance_url,
             api_base_url=api_base_url,
@@ -167,7 +160,8 @@ def run_now(req: RunRequest):
     finally:
         db.close()
 
-    return {"ok": True, "metrics": metrics}
+    # Return the response directly so FastAPI skips jsonable_encoder on the (large) metrics dict
+    return ORJSONResponse({"ok": True, "metrics": metrics})
 
 
 @app.get("/metrics/latest")
@@ -195,6 +189,6 @@ def latest_metrics(
         if not snap:
             return {"status": "empty"}
 
-        return {"status": "ok", "metrics": snap.metrics}
+        return ORJSONResponse({"status": "ok", "metrics": snap.metrics})
     finally:
         db.close()
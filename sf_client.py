@@ -1,8 +1,27 @@
 # sf_client.py
 from __future__ import annotations
 
+import random
+import socket
+import time
+import uuid
+
+import orjson
 import requests
-from urllib.parse import urljoin
+from urllib.parse import quote, urlencode, urljoin
+
+ODATA_ROOT = "odata/v2/"
+
+# Rows requested per page. SuccessFactors OData v2 serves at most 1000 rows per page.
+PAGE_SIZE = 1000
+
+# Transient failures worth retrying (throttling / gateway hiccups); anything else fails fast.
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MAX_RETRIES = 4
+MAX_BACKOFF_SECONDS = 30.0
+
+# Follow-up pages requested per $batch POST once a read's total row count is known.
+BATCH_PAGES = 10
 
 
 def normalize_base_url(u: str) -> str:
@@ -12,6 +31,62 @@ def normalize_base_url(u: str) -> str:
     return u.rstrip("/")
 
 
+def parse_batch_response(content_type: str, content: bytes) -> list[tuple[int, str]]:
+    """
+    Split an OData v2 $batch (multipart/mixed) response into (status, body) per part.
+    The body is decoded with the declared charset (UTF-8 if none): letting requests guess
+    the encoding means sniffing the whole multi-MB payload and can mangle non-ASCII names.
+    """
+    # Response boundary is chosen by the server
+    params = {}
+    for piece in content_type.split(";")[1:]:
+        k, _, v = piece.strip().partition("=")
+        params[k.strip().lower()] = v.strip().strip('"')
+    try:
+        text = (content or b"").decode(params.get("charset") or "utf-8", errors="replace")
+    except LookupError:  # unknown charset label
+        text = (content or b"").decode("utf-8", errors="replace")
+
+    resp_boundary = params.get("boundary")
+    if not content_type.lower().startswith("multipart/") or not resp_boundary:
+        snippet = text[:300].replace("\n", " ")
+        raise RuntimeError(f"$batch response is not multipart (Content-Type={content_type}). Body starts: {snippet}")
+
+    out: list[tuple[int, str]] = []
+    text = text.replace("\r\n", "\n")
+    for part in text.split(f"--{resp_boundary}")[1:]:
+        if part.startswith("--"):
+            break  # closing delimiter
+        # part = MIME headers, blank line, embedded HTTP response (status line, headers, blank line, body)
+        _, _, http = part.strip("\n").partition("\n\n")
+        head, _, payload = http.partition("\n\n")
+        status_line = head.split("\n", 1)[0].split()
+        status = int(status_line[1]) if len(status_line) > 1 and status_line[1].isdigit() else 0
+        out.append((status, payload.strip()))
+    return out
+
+
+def _is_permanent_connection_error(e: requests.ConnectionError) -> bool:
+    """
+    TLS failures and unresolvable host names won't fix themselves within a few seconds of
+    backoff (a mistyped instance URL would otherwise take ~8s to fail).
+    """
+    if isinstance(e, requests.exceptions.SSLError):
+        return True
+    # requests wraps urllib3's MaxRetryError; its reason chains back to the socket.gaierror
+    seen = set()
+    stack = [getattr(a, "reason", a) for a in e.args]
+    while stack:
+        x = stack.pop()
+        if not isinstance(x, BaseException) or id(x) in seen:
+            continue
+        if isinstance(x, socket.gaierror):
+            return True
+        seen.add(id(x))
+        stack += [x.__cause__, x.__context__]
+    return False
+
+
 class SFClient:
     def __init__(self, base_url: str, username: str, password: str, timeout: int = 60, verify_ssl: bool = True):
         self.base_url = normalize_base_url(base_url)
@@ -20,10 +95,40 @@ class SFClient:
         self.timeout = timeout
         self.verify_ssl = verify_ssl
 
-    def _request(self, path: str, params: dict | None = None) -> dict:
+    def _send(self, send, url: str, retries: int = MAX_RETRIES, **kwargs):
+        """
+        Call send (requests.get/post) with exponential backoff on transient failures:
+        RETRY_STATUSES and connection errors (incl. connect timeouts). Other statuses
+        (400/401/403/404...) come straight back so callers can fail fast or fall back.
+        A read timeout is not retried: each attempt could wait the full timeout again,
+        holding the synchronous /run for minutes before failing anyway. Neither are TLS
+        errors or host names that don't resolve.
+        """
+        for attempt in range(retries + 1):
+            try:
+                r = send(url, **kwargs)
+            except requests.ConnectionError as e:  # ConnectTimeout subclasses it; ReadTimeout does not
+                if attempt == retries or _is_permanent_connection_error(e):
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+
+            if r.status_code not in RETRY_STATUSES or attempt == retries:
+                return r
+            time.sleep(self._backoff(attempt, r.headers.get("Retry-After")))
+
+    @staticmethod
+    def _backoff(attempt: int, retry_after: str | None = None) -> float:
+        if retry_after and retry_after.strip().isdigit():
+            return min(MAX_BACKOFF_SECONDS, float(retry_after.strip()))
+        return min(MAX_BACKOFF_SECONDS, 0.5 * (2 ** attempt)) + random.uniform(0, 0.25)
+
+    def _request(self, path: str, params: dict | None = None, retries: int = MAX_RETRIES) -> dict:
         url = urljoin(self.base_url + "/", path.lstrip("/"))
-        r = requests.get(
+        r = self._send(
+            requests.get,
             url,
+            retries=retries,
             params=params or {},
             auth=(self.username, self.password),
             timeout=self.timeout,
@@ -45,7 +150,8 @@ class SFClient:
             )
 
         try:
-            return r.json()
+            # orjson parses the large OData payloads several times faster than stdlib json
+            return orjson.loads(r.content)
         except Exception:
             snippet = (r.text or "")[:300].replace("\n", " ")
             raise RuntimeError(f"JSON decode failed from {url}. Body starts: {snippet}")
@@ -53,35 +159,175 @@ class SFClient:
     def probe(self) -> bool:
         """
         Cheap call to confirm base_url is a real OData JSON endpoint.
+        Single attempt: a wrong URL or credentials should fail /probe and /run straight away.
         """
         j = self._request(
             "/odata/v2/User",
             {"$select": "userId", "$top": 1, "$format": "json"},
+            retries=0,
         )
         # Expect OData v2 JSON shape
         return isinstance(j, dict) and ("d" in j)
 
-    def get_all(self, path: str, params: dict) -> list[dict]:
+    def iter_all(self, path: str, params: dict, first_page: dict | None = None):
+        """
+        Yield rows page by page so callers can filter without holding the full collection.
+        first_page: an already-fetched response for the $skip in params (e.g. from $batch).
+        """
         params = dict(params or {})
         params.setdefault("$format", "json")
-        params.setdefault("$top", 1000)
+        params.setdefault("$top", PAGE_SIZE)
+        top = int(params["$top"])
 
-        out: list[dict] = []
-        skip = 0
+        skip = int(params.get("$skip") or 0)
+        j = first_page
+        server_paged = False
 
         while True:
-            params["$skip"] = skip
-            j = self._request(path, params)
+            if j is None:
+                params["$skip"] = skip
+                j = self._request(path, params)
 
             d = j.get("d") or {}
             results = d.get("results") or []
             if not results:
                 break
 
-            out.extend(results)
-            if len(results) < int(params["$top"]):
+            yield from results
+
+            # Server-driven paging (SF may cap the page size): follow its continuation link.
+            # Once on that chain, a page without __next is the last one; $skip no longer applies.
+            next_url = d.get("__next")
+            if next_url:
+                server_paged = True
+                j = self._request(next_url)
+                continue
+            if server_paged or len(results) < top:
                 break
 
-            skip += int(params["$top"])
+            skip += top
+            j = None
+
+    def get_all(self, path: str, params: dict) -> list[dict]:
+        return list(self.iter_all(path, params))
 
+    def _batch(self, parts: list[tuple[str, dict]]) -> list[tuple[int, str]]:
+        """
+        POST several GETs as one OData v2 $batch request.
+        Returns (status, body) per part, in request order.
+        """
+        boundary = "batch_" + uuid.uuid4().hex
+        chunks = []
+        for path, params in parts:
+            # part URLs are relative to the service root
+            rel = path.lstrip("/")
+            if rel.startswith(ODATA_ROOT):
+                rel = rel[len(ODATA_ROOT):]
+            qs = urlencode(params or {}, quote_via=quote, safe="$,'/")
+            chunks.append(
+                f"--{boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                "Content-Transfer-Encoding: binary\r\n"
+                "\r\n"
+                f"GET {rel}?{qs} HTTP/1.1\r\n"
+                "Accept: application/json\r\n"
+                "\r\n"
+            )
+        body = "".join(chunks) + f"--{boundary}--\r\n"
+
+        url = urljoin(self.base_url + "/", ODATA_ROOT + "$batch")
+        r = self._send(
+            requests.post,
+            url,
+            data=body.encode("utf-8"),
+            auth=(self.username, self.password),
+            timeout=self.timeout,
+            verify=self.verify_ssl,
+            headers={
+                "Content-Type": f"multipart/mixed; boundary={boundary}",
+                "Accept": "multipart/mixed",
+            },
+        )
+        r.raise_for_status()
+
+        out = parse_batch_response(r.headers.get("Content-Type") or "", r.content)
+        if len(out) != len(parts):
+            raise RuntimeError(f"$batch returned {len(out)} parts for {len(parts)} requests")
         return out
+
+    def batch_iter_all(self, reads: list[tuple[str, dict]]) -> list:
+        """
+        Like iter_all for several independent reads, but the first page of every read
+        travels in one $batch round trip. Each first page also asks for the total row count,
+        so the remaining pages can be requested BATCH_PAGES at a time (see _iter_batch_part).
+        Returns one row iterator per request; a failed part raises when its iterator is consumed.
+        """
+        prepared = []
+        for path, params in reads:
+            p = dict(params or {})
+            p.setdefault("$format", "json")
+            p.setdefault("$top", PAGE_SIZE)
+            p["$skip"] = 0
+            prepared.append((path, p))
+
+        responses = self._batch([(path, {**p, "$inlinecount": "allpages"}) for path, p in prepared])
+        return [self._iter_batch_part(path, p, status, body) for (path, p), (status, body) in zip(prepared, responses)]
+
+    def _batch_part_json(self, path: str, params: dict, status: int, body: str) -> dict:
+        """
+        Parse one $batch part. _send only sees the outer POST status, so a part that was
+        throttled or hit a gateway hiccup (RETRY_STATUSES) is re-requested on its own,
+        with the usual backoff policy, instead of failing the whole read.
+        """
+        if status in RETRY_STATUSES:
+            time.sleep(self._backoff(0))
+            return self._request(path, params)
+        if status >= 400 or status == 0:
+            snippet = body[:300].replace("\n", " ")
+            raise RuntimeError(f"$batch part {path} failed with HTTP {status}. Body starts: {snippet}")
+        try:
+            return orjson.loads(body)
+        except Exception:
+            snippet = body[:300].replace("\n", " ")
+            raise RuntimeError(f"JSON decode failed for $batch part {path}. Body starts: {snippet}")
+
+    def _iter_batch_part(self, path: str, params: dict, status: int, body: str):
+        j = self._batch_part_json(path, {**params, "$inlinecount": "allpages"}, status, body)
+
+        d = j.get("d") or {}
+        results = d.get("results") or []
+        top = int(params["$top"])
+        count = str(d.get("__count") or "")
+        # Server-driven paging, a short first page or no count: page one request at a time.
+        if d.get("__next") or len(results) < top or not count.isdigit():
+            yield from self.iter_all(path, params, first_page=j)
+            return
+
+        yield from results
+        yield from self._iter_pages_batched(path, params, top, int(count))
+
+    def _iter_pages_batched(self, path: str, params: dict, skip: int, total: int):
+        """
+        Yield the $skip pages from skip up to total, BATCH_PAGES pages per $batch POST.
+        If the collection grew past total meanwhile, the tail is paged as usual; so is
+        everything from skip on if a $batch POST itself fails (e.g. a gateway timeout
+        on the combined response).
+        """
+        top = int(params["$top"])
+        full = True
+        while skip < total:
+            skips = range(skip, min(total, skip + BATCH_PAGES * top), top)
+            try:
+                responses = self._batch([(path, {**params, "$skip": s}) for s in skips])
+            except (requests.RequestException, RuntimeError):
+                yield from self.iter_all(path, {**params, "$skip": skip})
+                return
+            for s, (status, body) in zip(skips, responses):
+                j = self._batch_part_json(path, {**params, "$skip": s}, status, body)
+                results = (j.get("d") or {}).get("results") or []
+                yield from results
+                full = len(results) == top
+            skip = skips[-1] + top
+
+        if full:
+            yield from self.iter_all(path, {**params, "$skip": skip})
@@ -0,0 +1,322 @@
+# tests/test_gates.py
+import re
+
+import pytest
+import requests
+
+from gates import run_ec_gates
+
+EMPJOB = "/odata/v2/EmpJob"
+USER = "/odata/v2/User"
+EMPEMPLOYMENT = "/odata/v2/EmpEmployment"
+
+SELECT_RICH = "userId,managerId,company,businessUnit,division,department,location,emplStatus,effectiveLatestChange,employeeClass,employeeType,employmentType,isContingentWorker"
+SELECT_NO_TYPES = "userId,managerId,company,businessUnit,division,department,location,emplStatus,effectiveLatestChange,employeeClass"
+
+_COMPANY_EQ = re.compile(r"company eq '((?:[^']|'')*)'")
+
+
+class FakeSF:
+    """
+    In-memory SFClient with only get_all/iter_all: honours $select (400 on rejected fields),
+    $top and the company filter, and answers 404 for missing entity sets.
+    """
+
+    def __init__(self, tables, rejected_fields=(), missing=()):
+        self.tables = tables
+        self.rejected_fields = set(rejected_fields)
+        self.missing = set(missing)
+        self.calls = []
+
+    def iter_all(self, path, params):
+        self.calls.append((path, dict(params)))
+        return self._rows(path, params)
+
+    def get_all(self, path, params):
+        return list(self.iter_all(path, params))
+
+    def _rows(self, path, params):
+        if path in self.missing:
+            raise requests.HTTPError(f"404 Client Error: Not Found for url: {path}")
+        fields = params["$select"].split(",")
+        bad = sorted(self.rejected_fields.intersection(fields)) if path == EMPJOB else []
+        if bad:
+            raise requests.HTTPError(f"400 Client Error: Bad Request (Invalid property names: {bad})")
+
+        rows = self.tables[path]
+        m = _COMPANY_EQ.search(params.get("$filter", ""))
+        if m:
+            company = m.group(1).replace("''", "'")
+            rows = [r for r in rows if r.get("company") == company]
+        if "$top" in params:
+            rows = rows[: int(params["$top"])]
+        for r in rows:
+            yield {k: r[k] for k in fields if k in r}
+
+
+class FakeBatchSF(FakeSF):
+    """FakeSF that also has batch_iter_all; part errors surface when a part is consumed."""
+
+    def __init__(self, tables, batch_down=False, **kwargs):
+        super().__init__(tables, **kwargs)
+        self.batch_down = batch_down
+
+    def batch_iter_all(self, reads):
+        if self.batch_down:
+            raise requests.HTTPError("404 Client Error: Not Found for url: /odata/v2/$batch")
+        return [self.iter_all(path, params) for path, params in reads]
+
+
+@pytest.fixture(params=[FakeSF, FakeBatchSF], ids=["paged", "batch"])
+def client_cls(request):
+    return request.param
+
+
+def _job(uid, **kw):
+    row = {
+        "userId": uid,
+        "managerId": "m1",
+        "company": "ACME",
+        "businessUnit": "BU",
+        "division": "DIV",
+        "department": "DEPT",
+        "location": "LOC",
+        "emplStatus": "A",
+        "effectiveLatestChange": True,
+        "employeeClass": "E",
+        "employeeType": "regular",
+        "employmentType": "permanent",
+        "isContingentWorker": False,
+    }
+    row.update(kw)
+    return row
+
+
+def _user(uid, email, status="active", username=None):
+    return {"userId": uid, "status": status, "email": email, "username": username or f"user {uid}"}
+
+
+CLEAN = [f"c{i:02d}" for i in range(19)]
+
+
+def _tables():
+    return {
+        EMPJOB: [
+            _job("u1", company="O'Brien & Co"),
+            # Padded id, no manager, EmpJob says contingent but EmpEmployment says not
+            _job(" u2 ", managerId="", isContingentWorker="true"),
+            # Terminated, two blank org fields, contingent by employeeClass only
+            _job("u3", businessUnit=" ", division=None, emplStatus="T", employeeClass="Contractor",
+                 employeeType=None, employmentType=None, isContingentWorker=None),
+            # Integer id, nav-dict emplStatus, no manager; EmpEmployment says contingent
+            _job(7, company="O'Brien & Co", managerId=None, emplStatus={"code": "A"}),
+            # No emplStatus: User.status decides
+            _job("u5", emplStatus=None),
+        ]
+        + [_job(uid) for uid in CLEAN],
+        USER: [
+            _user("u1", "Dup@Example.com"),
+            _user("u2", "n/a", status="inactive"),  # EmpJob emplStatus A wins
+            _user("u3", "u3@example.com"),  # EmpJob emplStatus T wins
+            _user("7 ", " dup@example.com ", status="inactive"),
+            _user("u5", "u5@example.com", status="inactive"),
+            _user("u6", "dup@example.com", status=None),  # no job, unknown status: counted active
+            _user("u8", None),
+        ]
+        + [_user(uid, f"{uid}@example.com") for uid in CLEAN],
+        EMPEMPLOYMENT: [
+            {"userId": "u2", "isContingentWorker": "false"},
+            {"userId": 7, "isContingentWorker": "Y"},
+            {"userId": "u9", "isContingentWorker": "maybe"},
+        ],
+    }
+
+
+def _run(sf, **kwargs):
+    m = run_ec_gates(sf, instance_url="https://acme.successfactors.com", api_base_url="https://api4.successfactors.com", **kwargs)
+    assert m.pop("snapshot_time_utc")
+    return m
+
+
+EXPECTED = {
+    "instance_url": "https://acme.successfactors.com",
+    "api_base_url": "https://api4.successfactors.com",
+    "company_id": "",
+    # u1, u2, 7 and the clean users by emplStatus A, u6 by default (unknown), u8 by User.status
+    "active_users": 24,
+    "inactive_users": 2,
+    "inactive_user_count": 2,
+    "empjob_rows": 24,
+    "current_empjob_rows": 24,
+    "missing_manager_count": 2,
+    "missing_manager_pct": 8.33,
+    "invalid_org_count": 1,
+    "invalid_org_pct": 4.17,
+    "missing_email_count": 2,
+    "duplicate_email_count": 2,
+    "contingent_workers": 2,
+    "contingent_worker_count": 2,
+    # 833bp // 50 + 416bp // 50 + 833bp // 100 + 200 // 24
+    "risk_score": 40,
+    "invalid_org_sample": [
+        {
+            "userId": "u3",
+            "missingFields": "businessUnit, division",
+            "company": "ACME",
+            "businessUnit": " ",
+            "division": None,
+            "department": "DEPT",
+            "location": "LOC",
+            "managerId": "m1",
+        }
+    ],
+    "missing_manager_sample": [{"userId": "u2", "managerId": ""}, {"userId": "7", "managerId": None}],
+    "org_missing_field_counts": {"company": 0, "businessUnit": 1, "division": 1, "department": 0, "location": 0},
+    "missing_email_sample": [
+        {"userId": "u2", "email": "n/a", "username": "user u2"},
+        {"userId": "u8", "email": "", "username": "user u8"},
+    ],
+    "duplicate_email_sample": [{"email": "dup@example.com", "count": 3, "sampleUserIds": ["u1", "7", "u6"]}],
+    "inactive_users_sample": [
+        {"userId": "u3", "emplStatus": "T", "status": "active", "email": "u3@example.com", "username": "user u3"},
+        {"userId": "u5", "emplStatus": None, "status": "inactive", "email": "u5@example.com", "username": "user u5"},
+    ],
+    "contingent_workers_sample": [
+        {"userId": "u3", "isContingentWorker": None, "employeeClass": "Contractor", "employeeType": None, "employmentType": None},
+        {"userId": "7", "isContingentWorker": False, "employeeClass": "E", "employeeType": "regular", "employmentType": "permanent"},
+    ],
+    "employee_status_source": "EmpJob.emplStatus -> fallback(User.status)",
+    "emplstatus_value_counts": {"a": 22, "t": 1},
+    "unknown_status_user_count": 1,
+    "contingent_source": "EmpEmployment.isContingentWorker -> fallback(EmpJob fields)",
+    "empjob_select_used": SELECT_RICH,
+    "empemployment_available": True,
+    "empemployment_error": "",
+    "batch_error": "",
+}
+
+
+def test_metrics_for_fixed_fixture(client_cls):
+    assert _run(client_cls(_tables())) == EXPECTED
+
+
+def test_batch_failure_is_reported_and_reads_fall_back():
+    m = _run(FakeBatchSF(_tables(), batch_down=True))
+    assert m.pop("batch_error") == "404 Client Error: Not Found for url: /odata/v2/$batch"
+    assert m == {k: v for k, v in EXPECTED.items() if k != "batch_error"}
+
+
+def test_rejected_empjob_select_walks_the_fallback_chain(client_cls):
+    sf = client_cls(_tables(), rejected_fields={"isContingentWorker", "employmentType"})
+    m = _run(sf)
+
+    # Rich, no-isContingentWorker and no-emplStatus candidates all select a rejected field
+    assert m["empjob_select_used"] == SELECT_NO_TYPES
+    full_reads = [p["$select"] for path, p in sf.calls if path == EMPJOB and "$top" not in p]
+    assert full_reads == [SELECT_RICH, SELECT_NO_TYPES]
+    # Only employeeClass is left on EmpJob; EmpEmployment still decides for u2 and 7
+    assert m["contingent_worker_count"] == 2
+    assert [r["userId"] for r in m["contingent_workers_sample"]] == ["u3", "7"]
+    assert m["active_users"] == EXPECTED["active_users"]
+    assert m["risk_score"] == EXPECTED["risk_score"]
+
+
+def test_unusable_empjob_raises(client_cls):
+    sf = client_cls(_tables(), rejected_fields={"userId"})
+    with pytest.raises(RuntimeError, match="Unable to fetch EmpJob with any select candidate"):
+        _run(sf)
+
+
+def test_empemployment_404_falls_back_to_empjob_fields(client_cls):
+    m = _run(client_cls(_tables(), missing={EMPEMPLOYMENT}))
+
+    assert m["empemployment_available"] is False
+    assert "404 Client Error" in m["empemployment_error"]
+    assert EMPEMPLOYMENT in m["empemployment_error"]
+    assert m["contingent_source"] == "EmpJob.isContingentWorker/employeeClass/employeeType/employmentType (best-effort)"
+    # u2 is now contingent by its EmpJob flag; 7 loses the EmpEmployment one
+    assert [r["userId"] for r in m["contingent_workers_sample"]] == ["u2", "u3"]
+    assert m["batch_error"] == ""
+
+
+def test_company_scope_escapes_quotes(client_cls):
+    sf = client_cls(_tables())
+    m = _run(sf, company_id="O'Brien & Co")
+
+    filters = {p["$filter"] for path, p in sf.calls if path == EMPJOB}
+    assert filters == {"effectiveLatestChange eq true and company eq 'O''Brien & Co'"}
+    assert m["company_id"] == "O'Brien & Co"
+    assert m["empjob_rows"] == 2
+    # Only u1 and 7 hold a job in the company; users outside it are skipped entirely
+    assert m["active_users"] == 2
+    assert m["inactive_users"] == 0
+    assert m["unknown_status_user_count"] == 0
+    assert m["missing_manager_sample"] == [{"userId": "7", "managerId": None}]
+    assert m["missing_manager_pct"] == 50.0
+    assert m["missing_email_count"] == 0
+    assert m["duplicate_email_sample"] == [{"email": "dup@example.com", "count": 2, "sampleUserIds": ["u1", "7"]}]
+
+
+def test_user_ids_are_joined_after_canonicalization(client_cls):
+    tables = {
+        EMPJOB: [_job(" a1\t", emplStatus="T"), _job(42, emplStatus="A"), _job("", emplStatus="T")],
+        USER: [_user("a1", "a1@example.com"), _user(" 42 ", "x@example.com", status="inactive")],
+        EMPEMPLOYMENT: [{"userId": "42 ", "isContingentWorker": True}, {"userId": "  ", "isContingentWorker": True}],
+    }
+    m = _run(client_cls(tables))
+
+    # emplStatus from EmpJob wins over User.status on both users, so the ids matched
+    assert m["active_users"] == 1
+    assert [u["userId"] for u in m["inactive_users_sample"]] == ["a1"]
+    assert [r["userId"] for r in m["contingent_workers_sample"]] == ["42"]
+    assert m["unknown_status_user_count"] == 0
+
+
+def test_samples_stop_at_max_sample(client_cls):
+    n = 250
+    ids = [f"x{i:03d}" for i in range(n)]
+    tables = {
+        EMPJOB: [
+            _job(uid, managerId=None, company=None, emplStatus="T", isContingentWorker=True) for uid in ids
+        ],
+        USER: [_user(uid, "") for uid in ids] + [_user(f"n{i:03d}", "none") for i in range(n)],
+        EMPEMPLOYMENT: [],
+    }
+    m = _run(client_cls(tables))
+
+    assert m["missing_manager_count"] == m["invalid_org_count"] == m["contingent_worker_count"] == n
+    assert m["inactive_user_count"] == n
+    assert m["missing_email_count"] == n
+    for key in (
+        "missing_manager_sample",
+        "invalid_org_sample",
+        "contingent_workers_sample",
+        "inactive_users_sample",
+        "missing_email_sample",
+    ):
+        assert len(m[key]) == 200, key
+    assert [r["userId"] for r in m["missing_manager_sample"]] == ids[:200]
+    assert [r["userId"] for r in m["inactive_users_sample"]] == ids[:200]
+    assert [r["userId"] for r in m["missing_email_sample"]] == [f"n{i:03d}" for i in range(200)]
+
+
+def test_duplicate_email_ties_keep_first_seen_order_at_the_cut(client_cls):
+    n = 250
+    emails = [f"e{i:03d}@example.com" for i in range(n)]
+    users = [_user(f"a{i:03d}", e) for i, e in enumerate(emails)]
+    # Repeats arrive in reverse order, so groups are created last-seen first
+    users += [_user(f"b{i:03d}", emails[i].upper()) for i in reversed(range(n))]
+    users += [_user(f"big{i:02d}", "big@example.com") for i in range(12)]
+    tables = {EMPJOB: [], USER: users, EMPEMPLOYMENT: []}
+    m = _run(client_cls(tables))
+
+    sample = m["duplicate_email_sample"]
+    assert m["duplicate_email_count"] == n + 11
+    assert len(sample) == 200
+    assert sample[0] == {
+        "email": "big@example.com",
+        "count": 12,
+        "sampleUserIds": [f"big{i:02d}" for i in range(10)],
+    }
+    assert [r["email"] for r in sample[1:]] == emails[:199]
+    assert sample[1]["sampleUserIds"] == ["a000", "b000"]
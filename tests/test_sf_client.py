@@ -0,0 +1,238 @@
+# tests/test_sf_client.py
+import orjson
+import pytest
+
+import sf_client
+from sf_client import SFClient, parse_batch_response
+
+# A SuccessFactors OData v2 $batch response in the shape the API returns it: CRLF line endings,
+# a server-chosen "batch_<guid>" boundary, one application/http part per GET (a User page with
+# non-ASCII names, a rejected $select, an empty EmpEmployment page) and no charset parameter.
+SF_BATCH_BOUNDARY = "batch_5f0c2f4a-8b1e-4a8e-9a51-3c7f2f9d1e10"
+SF_BATCH_CONTENT_TYPE = f"multipart/mixed; boundary={SF_BATCH_BOUNDARY}"
+SF_BATCH_BODY = (
+    f"--{SF_BATCH_BOUNDARY}\r\n"
+    "Content-Type: application/http\r\n"
+    "Content-Transfer-Encoding: binary\r\n"
+    "\r\n"
+    "HTTP/1.1 200 OK\r\n"
+    "Content-Type: application/json;charset=utf-8\r\n"
+    "DataServiceVersion: 2.0\r\n"
+    "\r\n"
+    '{"d":{"__count":"2","results":['
+    '{"__metadata":{"uri":"https://api4.successfactors.com/odata/v2/User(\'100001\')","type":"SFOData.User"},'
+    '"userId":"100001","status":"active","email":"zoe.muller@example.com","username":"Zoë Müller"},'
+    '{"__metadata":{"uri":"https://api4.successfactors.com/odata/v2/User(\'100002\')","type":"SFOData.User"},'
+    '"userId":"100002","status":"inactive","email":"","username":"José Peña"}]}}\r\n'
+    f"--{SF_BATCH_BOUNDARY}\r\n"
+    "Content-Type: application/http\r\n"
+    "Content-Transfer-Encoding: binary\r\n"
+    "\r\n"
+    "HTTP/1.1 400 Bad Request\r\n"
+    "Content-Type: application/json;charset=utf-8\r\n"
+    "\r\n"
+    '{"error":{"code":"COE_PROPERTY_NOT_FOUND","message":{"lang":"en-US",'
+    '"value":"[COE0021]Invalid property names: EmpJob/isContingentWorker."}}}\r\n'
+    f"--{SF_BATCH_BOUNDARY}\r\n"
+    "Content-Type: application/http\r\n"
+    "Content-Transfer-Encoding: binary\r\n"
+    "\r\n"
+    "HTTP/1.1 200 OK\r\n"
+    "Content-Type: application/json;charset=utf-8\r\n"
+    "\r\n"
+    '{"d":{"__count":"0","results":[]}}\r\n'
+    f"--{SF_BATCH_BOUNDARY}--\r\n"
+).encode("utf-8")
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, content=b"", content_type="application/json", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = {"Content-Type": content_type, **(headers or {})}
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise sf_client.requests.HTTPError(f"{self.status_code} Error", response=self)
+
+
+def test_parse_batch_response_splits_sf_parts():
+    parts = parse_batch_response(SF_BATCH_CONTENT_TYPE, SF_BATCH_BODY)
+
+    assert [status for status, _ in parts] == [200, 400, 200]
+
+    users = orjson.loads(parts[0][1])["d"]["results"]
+    assert [u["userId"] for u in users] == ["100001", "100002"]
+    # No charset on the multipart Content-Type: decoded as UTF-8, not guessed
+    assert [u["username"] for u in users] == ["Zoë Müller", "José Peña"]
+
+    assert "COE_PROPERTY_NOT_FOUND" in parts[1][1]
+    assert orjson.loads(parts[2][1])["d"]["results"] == []
+
+
+def test_parse_batch_response_honours_declared_charset():
+    body = SF_BATCH_BODY.decode("utf-8").encode("latin-1")
+    parts = parse_batch_response(f"{SF_BATCH_CONTENT_TYPE}; charset=ISO-8859-1", body)
+    users = orjson.loads(parts[0][1])["d"]["results"]
+    assert users[0]["username"] == "Zoë Müller"
+
+
+def test_parse_batch_response_rejects_non_multipart():
+    with pytest.raises(RuntimeError, match="not multipart"):
+        parse_batch_response("text/html", b"<html>login</html>")
+
+
+def test_batch_posts_one_multipart_request(monkeypatch):
+    sent = {}
+
+    def fake_post(url, data=None, headers=None, **kwargs):
+        sent.update(url=url, data=data.decode("utf-8"), headers=headers)
+        return FakeResponse(202, SF_BATCH_BODY, SF_BATCH_CONTENT_TYPE)
+
+    monkeypatch.setattr(sf_client.requests, "post", fake_post)
+    sf = SFClient("https://api4.successfactors.com/", "u", "p")
+
+    out = sf._batch(
+        [
+            ("/odata/v2/User", {"$select": "userId,status,email,username", "$top": 2}),
+            ("/odata/v2/EmpJob", {"$filter": "effectiveLatestChange eq true"}),
+            ("/odata/v2/EmpEmployment", {"$select": "userId,isContingentWorker"}),
+        ]
+    )
+
+    assert sent["url"] == "https://api4.successfactors.com/odata/v2/$batch"
+    assert sent["headers"]["Content-Type"].startswith("multipart/mixed; boundary=batch_")
+    assert "GET User?$select=userId,status,email,username&$top=2 HTTP/1.1" in sent["data"]
+    assert "GET EmpJob?$filter=effectiveLatestChange%20eq%20true HTTP/1.1" in sent["data"]
+    assert [status for status, _ in out] == [200, 400, 200]
+
+
+def _page(rows, count=None):
+    d = {"results": rows}
+    if count is not None:
+        d["__count"] = str(count)
+    return orjson.dumps({"d": d}).decode()
+
+
+def test_transient_batch_parts_are_re_requested(monkeypatch):
+    rows = [{"userId": str(i)} for i in range(10)]
+    sf = SFClient("https://api4.successfactors.com", "u", "p")
+    requested = []
+
+    def fake_batch(parts):
+        # First page is throttled; of the follow-up pages, $skip=4 hits a gateway error.
+        out = []
+        for _, params in parts:
+            skip = params["$skip"]
+            if skip in (0, 4):
+                out.append((503 if skip == 4 else 429, "Service Unavailable"))
+            else:
+                out.append((200, _page(rows[skip:skip + 2])))
+        return out
+
+    def fake_request(path, params=None):
+        requested.append(dict(params))
+        skip = params["$skip"]
+        return orjson.loads(_page(rows[skip:skip + 2], count=len(rows) if "$inlinecount" in params else None))
+
+    monkeypatch.setattr(sf, "_batch", fake_batch)
+    monkeypatch.setattr(sf, "_request", fake_request)
+    monkeypatch.setattr(sf_client.time, "sleep", lambda s: None)
+
+    (it,) = sf.batch_iter_all([("/odata/v2/User", {"$select": "userId", "$top": 2})])
+
+    assert [r["userId"] for r in it] == [str(i) for i in range(10)]
+    assert [(p["$skip"], p.get("$inlinecount")) for p in requested] == [(0, "allpages"), (4, None), (10, None)]
+
+
+def test_failed_batch_post_falls_back_to_paged_gets(monkeypatch):
+    rows = [{"userId": str(i)} for i in range(30)]
+    sf = SFClient("https://api4.successfactors.com", "u", "p")
+    posts = []
+    requested = []
+
+    def fake_batch(parts):
+        posts.append([params["$skip"] for _, params in parts])
+        if len(posts) == 3:  # second follow-up POST times out
+            raise sf_client.requests.ReadTimeout("read timed out")
+        first = len(posts) == 1
+        return [(200, _page(rows[p["$skip"]:p["$skip"] + 2], count=len(rows) if first else None)) for _, p in parts]
+
+    def fake_request(path, params=None):
+        requested.append(params["$skip"])
+        skip = params["$skip"]
+        return orjson.loads(_page(rows[skip:skip + 2]))
+
+    monkeypatch.setattr(sf, "_batch", fake_batch)
+    monkeypatch.setattr(sf, "_request", fake_request)
+
+    (it,) = sf.batch_iter_all([("/odata/v2/User", {"$select": "userId", "$top": 2})])
+
+    assert [r["userId"] for r in it] == [str(i) for i in range(30)]
+    assert posts == [[0], list(range(2, 22, 2)), list(range(22, 30, 2))]
+    assert requested == [22, 24, 26, 28, 30]
+
+
+def test_non_transient_batch_part_fails_fast(monkeypatch):
+    sf = SFClient("https://api4.successfactors.com", "u", "p")
+    monkeypatch.setattr(sf, "_batch", lambda parts: [(400, '{"error":{"code":"COE_PROPERTY_NOT_FOUND"}}')])
+    monkeypatch.setattr(sf, "_request", lambda *a, **k: pytest.fail("400 parts must not be retried"))
+
+    (it,) = sf.batch_iter_all([("/odata/v2/EmpJob", {"$select": "userId,isContingentWorker"})])
+    with pytest.raises(RuntimeError, match="HTTP 400"):
+        list(it)
+
+
+@pytest.mark.parametrize(
+    "exc, calls",
+    [
+        (sf_client.requests.ConnectTimeout, sf_client.MAX_RETRIES + 1),
+        (sf_client.requests.ConnectionError, sf_client.MAX_RETRIES + 1),
+        (sf_client.requests.ReadTimeout, 1),
+        (sf_client.requests.exceptions.SSLError, 1),
+    ],
+)
+def test_send_retries_only_transient_connection_failures(monkeypatch, exc, calls):
+    sf = SFClient("https://api4.successfactors.com", "u", "p")
+    attempts = []
+
+    def send(url, **kwargs):
+        attempts.append(url)
+        raise exc("boom")
+
+    monkeypatch.setattr(sf_client.time, "sleep", lambda s: None)
+    with pytest.raises(exc):
+        sf._send(send, "https://api4.successfactors.com/odata/v2/User")
+    assert len(attempts) == calls
+
+
+def test_send_does_not_retry_unresolvable_hosts(monkeypatch):
+    sf = SFClient("https://nonexistent.invalid", "u", "p")
+    attempts = []
+
+    def send(url, **kwargs):
+        attempts.append(url)
+        return sf_client.requests.get(url, **kwargs)
+
+    monkeypatch.setattr(sf_client.time, "sleep", lambda s: pytest.fail("DNS failures must not back off"))
+    with pytest.raises(sf_client.requests.ConnectionError):
+        sf._send(send, "https://nonexistent.invalid/odata/v2/User", timeout=5)
+    assert len(attempts) == 1
+
+
+def test_probe_makes_a_single_attempt(monkeypatch):
+    attempts = []
+
+    def fake_get(url, **kwargs):
+        attempts.append(url)
+        raise sf_client.requests.ConnectionError("Connection refused")
+
+    monkeypatch.setattr(sf_client.requests, "get", fake_get)
+    monkeypatch.setattr(sf_client.time, "sleep", lambda s: pytest.fail("probe must not back off"))
+    with pytest.raises(sf_client.requests.ConnectionError):
+        SFClient("https://api4.successfactors.com", "u", "p").probe()
+    assert len(attempts) == 1